@@ -5,11 +5,199 @@ iGloba Ed Robot Controller
 適用於 Ubuntu 系統
 """
 
+import asyncio
+import logging
+import selectors
+import numpy as np
 import serial
 import time
 import struct
-import threading
-from typing import Optional, List, Tuple
+from enum import IntFlag
+from functools import lru_cache
+from typing import Optional, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 串列埠讀取逾時 (秒)
+_READ_TIMEOUT = 0.15
+
+# 命令緩衝區大小 (位元組), 較長的命令另行配置
+_CMD_BUF_SIZE = 8
+
+# 預先編譯的固定格式命令框架
+_DRIVE = struct.Struct('>Bhh')   # opcode + 兩個 signed 16-bit (137/145/146)
+_MOTORS = struct.Struct('>BB')   # opcode + 馬達位元組 (138)
+_LEDS = struct.Struct('>BB')     # opcode + LED 顏色 (139)
+_SENSOR = struct.Struct('>BB')   # opcode + 封包ID (142)
+
+
+def _clamp16(value: int, limit: int) -> int:
+    """將 signed 16-bit 命令參數限制在 [-limit, limit]"""
+    return -limit if value < -limit else limit if value > limit else value
+
+
+@lru_cache(maxsize=None)
+def _frame_struct(length: int) -> struct.Struct:
+    """取得指定長度的命令框架 Struct (可變長度命令使用, 例如資料流)"""
+    return struct.Struct(f'>{length}B')
+
+
+# 預先編譯的感測器資料格式 (big-endian)
+_U16 = struct.Struct('>H')       # 封包 13
+_I16 = struct.Struct('>h')       # 封包 15/16
+_I16X2 = struct.Struct('>2h')    # 封包 17
+_U16X2 = struct.Struct('>2H')    # 封包 18
+_U16X4 = struct.Struct('>4H')    # 封包 10/20
+_U16X7 = struct.Struct('>7H')    # 封包 9
+
+_IR_SENSOR_KEYS = tuple(f"ir_sensor_{i}" for i in range(1, 8))
+_GUIDE_SENSOR_KEYS = tuple(f"guide_sensor_{i}" for i in range(1, 5))
+
+# 各感測器封包的資料長度 (位元組)
+_PACKET_LENGTHS = {
+    7: 2, 8: 2, 9: 14, 10: 8, 11: 1, 12: 1, 13: 2,
+    15: 2, 16: 2, 17: 4, 18: 4, 19: 1, 20: 8,
+}
+
+
+def _packet_offsets(packet_ids: Tuple[int, ...]) -> Tuple[Tuple[int, int, int], ...]:
+    """計算多封包回應中各封包的 (封包ID, 起點, 終點)"""
+    offsets = []
+    start = 0
+    for packet_id in packet_ids:
+        end = start + _PACKET_LENGTHS[packet_id]
+        offsets.append((packet_id, start, end))
+        start = end
+    return tuple(offsets)
+
+
+# 主要感測器封包 (get_all_sensors 使用)
+_MAIN_PACKETS = (7, 11, 12, 13, 19)
+_MAIN_PACKET_OFFSETS = _packet_offsets(_MAIN_PACKETS)
+
+class IrBumps(IntFlag):
+    """IR 防碰撞感測器 (封包 7, bit 0-6)"""
+    S1 = 0x01
+    S2 = 0x02
+    S3 = 0x04
+    S4 = 0x08
+    S5 = 0x10
+    S6 = 0x20
+    S7 = 0x40
+
+
+class DropSensors(IntFlag):
+    """落下感測器 (封包 7, bit 9-11 右移至 bit 0-2)"""
+    S1 = 0x01
+    S2 = 0x02
+    S3 = 0x04
+
+
+# 狀態名稱對照
+_OPERATE_MODES = ("關閉(Off)", "被動(Passive)", "安全(Safe)", "完整(Full)")
+_CHARGING_STATES = ("未充電", "已充飽", "充電中", "充電錯誤")
+_COLOR_NAMES = ("關閉", "藍燈", "紅燈", "藍燈+紅燈")
+
+# Guide 感測器訊號類型與位元遮罩 (類型遮罩, 類型位移, 偵測旗標遮罩)
+_SIGNAL_TYPES = ("無訊號", "充電座中央訊號(2K)", "充電座右側訊號(10K)", "充電座左側訊號(5K)")
+_GUIDE_TYPE_MASKS = (
+    ("guide_sensor_1", 0x0003, 0, 0x1000),
+    ("guide_sensor_2", 0x000C, 2, 0x2000),
+    ("guide_sensor_3", 0x0030, 4, 0x4000),
+    ("guide_sensor_4", 0x00C0, 6, 0x8000),
+)
+
+# 資料流紀錄格式 (每個框架一筆, 存放於環形緩衝區)
+SENSOR_DTYPE = np.dtype([
+    ('ts', 'f8'),        # 接收時間 (每次讀取一個時間, 同一次讀取的框架相同)
+    ('mode', 'u1'),
+    ('battery_mv', 'u2'),
+    ('ir_mask', 'u2'),
+    ('drop_mask', 'u1'),
+    ('charging', 'u1'),
+    ('velocity', 'i2'),
+    ('radius', 'i2'),
+    ('left_vel', 'i2'),
+    ('right_vel', 'i2'),
+    ('left_enc', 'u2'),
+    ('right_enc', 'u2'),
+])
+STREAM_BUFFER_SIZE = 4096
+
+# 資料流快照欄位 (固定順序, 由 _parse_stream_batch 就地更新)
+STREAM_FIELDS = SENSOR_DTYPE.names[1:]
+_MODE, _BATTERY_MV, _IR_MASK, _DROP_MASK, _CHARGING = range(5)
+
+# 多位元組封包 -> (Struct, 快照欄位起點, 快照欄位終點)
+_STREAM_SLOTS = {
+    13: (_U16, 1, 2),
+    15: (_I16, 5, 6),
+    16: (_I16, 6, 7),
+    17: (_I16X2, 7, 9),
+    18: (_U16X2, 9, 11),
+}
+
+
+def _parse_stream_batch(data: bytes, record: list, history: np.ndarray,
+                        count: int, ts: float) -> Tuple[int, int]:
+    """
+    解析資料流框架 [19][n][封包ID][資料]...[校驗和] 並寫入環形緩衝區
+    
+    遇到非框架資料或校驗和錯誤時, 往後尋找下一個標頭重新同步。
+    
+    Args:
+        data: 資料流原始資料 (可包含多個框架, 開頭與結尾可為不完整框架)
+        record: 依 STREAM_FIELDS 排列的快照 (未出現的封包沿用前值)
+        history: SENSOR_DTYPE 環形緩衝區, 每個完整框架寫入一筆
+        count: 已寫入的框架總數
+        ts: 此批資料的接收時間
+        
+    Returns:
+        (更新後的框架總數, 已處理的位元組數); 其後的不完整框架應保留至下次解析
+    """
+    # 迴圈內使用的表格與方法先取為區域變數
+    lengths_get = _PACKET_LENGTHS.get
+    slots_get = _STREAM_SLOTS.get
+    unpack_u16 = _U16.unpack_from
+    size = len(history)
+    offset = 0
+    length = len(data)
+    while True:
+        offset = data.find(19, offset)  # 尋找框架標頭
+        if offset < 0:
+            return count, length
+        if offset + 1 >= length:
+            return count, offset  # 框架不完整, 保留
+        end = offset + 2 + data[offset + 1]
+        if end >= length:
+            return count, offset  # 框架不完整 (含校驗和), 保留
+        if sum(data[offset:end + 1]) & 0xFF:
+            offset += 1  # 校驗和錯誤, 並非框架標頭
+            continue
+        pos = offset + 2
+        while pos < end:
+            packet_id = data[pos]
+            pos += 1
+            packet_length = lengths_get(packet_id)
+            if packet_length is None or pos + packet_length > end:
+                break  # 未知封包, 無法定位此框架後續資料
+            slot = slots_get(packet_id)
+            if slot:
+                fmt, start, stop = slot
+                record[start:stop] = fmt.unpack_from(data, pos)
+            elif packet_id == 7:
+                value, = unpack_u16(data, pos)
+                record[_IR_MASK] = value & 0x7F
+                record[_DROP_MASK] = (value >> 9) & 0x07
+            elif packet_id == 12:
+                record[_CHARGING] = data[pos] & 0x03
+            elif packet_id == 19:
+                record[_MODE] = data[pos] & 0x03
+            pos += packet_length
+        history[count % size] = (ts, *record)
+        count += 1
+        offset = end + 1
+
 
 class iGlobaEdController:
     """iGloba Ed 機器人控制器"""
@@ -26,7 +214,34 @@ class iGlobaEdController:
         self.baudrate = baudrate
         self.serial_conn: Optional[serial.Serial] = None
         self.streaming = False
-        self.stream_thread: Optional[threading.Thread] = None
+        self._stream_selector: Optional[selectors.BaseSelector] = None
+        self._stream_event: Optional[asyncio.Event] = None
+        self._stream_record = [0] * len(STREAM_FIELDS)
+        self.stream_history = np.zeros(STREAM_BUFFER_SIZE, dtype=SENSOR_DTYPE)
+        self.stream_frames = 0
+        self._stream_buf = bytearray()  # 尚未組成完整框架的資料流資料
+        
+        # 重複使用的命令緩衝區 (命令皆在呼叫端執行緒送出, 不需鎖)
+        self._cmd_buf = bytearray(_CMD_BUF_SIZE)
+        self._cmd_view = memoryview(self._cmd_buf)
+        self._drive_frame = self._cmd_view[:_DRIVE.size]
+        
+        # 感測器封包解析器 (封包ID -> 解析方法)
+        self._parsers = {
+            7: self._parse_ir_bumps_drops,        # IR Bumps and Drops
+            8: self._parse_guide_sensors_flag,    # Guide Sensors Signal Detect
+            9: self._parse_ir_signal_level,       # IR Bumps Signal Level
+            10: self._parse_guide_signal_level,   # Guide Sensors Signal Level
+            11: self._parse_motor_overcurrents,   # Motors Overcurrents
+            12: self._parse_charging_state,       # Charging Source and State
+            13: self._parse_battery_voltage,      # Battery Voltage
+            15: self._parse_requested_velocity,   # Requested Velocity
+            16: self._parse_requested_radius,     # Requested Radius
+            17: self._parse_requested_lr_velocity,  # Requested Left/Right Velocity
+            18: self._parse_encoder_counts,       # Left/Right Encoder Counts
+            19: self._parse_operate_mode,         # Operate Mode
+            20: self._parse_motors_current,       # Motors Current
+        }
         
     def connect(self) -> bool:
         """連接到機器人"""
@@ -34,12 +249,13 @@ class iGlobaEdController:
             self.serial_conn = serial.Serial(
                 port=self.port,
                 baudrate=self.baudrate,
-                timeout=1
+                timeout=_READ_TIMEOUT,
+                write_timeout=1
             )
-            print(f"已連接到 {self.port}")
+            logger.info("已連接到 %s", self.port)
             return True
         except Exception as e:
-            print(f"連接失敗: {e}")
+            logger.error("連接失敗: %s", e)
             return False
     
     def disconnect(self):
@@ -47,8 +263,9 @@ class iGlobaEdController:
         if self.streaming:
             self.stop_stream()
         if self.serial_conn and self.serial_conn.is_open:
+            self.flush()
             self.serial_conn.close()
-            print("已斷開連接")
+            logger.info("已斷開連接")
     
     def send_command(self, opcode: int, data: List[int] = None) -> bool:
         """
@@ -58,68 +275,95 @@ class iGlobaEdController:
             opcode: 操作碼
             data: 資料位元組列表
         """
+        length = len(data) + 1 if data else 1
+        frame_struct = _frame_struct(length)
+        try:
+            if length <= _CMD_BUF_SIZE:
+                frame_struct.pack_into(self._cmd_buf, 0, opcode, *(data or ()))
+                frame = self._cmd_view[:length]
+            else:
+                frame = frame_struct.pack(opcode, *data)
+        except struct.error as e:
+            logger.error("發送命令失敗: %s", e)
+            return False
+        return self._write_frame(frame)
+    
+    def _write_frame(self, frame: Union[bytes, memoryview]) -> bool:
+        """
+        寫出已編碼的命令框架
+        
+        Args:
+            frame: 完整命令 (操作碼 + 資料)
+        """
+        if not self.serial_conn or not self.serial_conn.is_open:
+            logger.error("錯誤: 未連接到機器人")
+            return False
+        
+        try:
+            self.serial_conn.write(frame)
+            return True
+        except Exception as e:
+            logger.error("發送命令失敗: %s", e)
+            return False
+    
+    def flush(self) -> bool:
+        """等待已寫出的命令全部送出 (用於多命令序列結束時)"""
         if not self.serial_conn or not self.serial_conn.is_open:
-            print("錯誤: 未連接到機器人")
             return False
         
         try:
-            command = [opcode]
-            if data:
-                command.extend(data)
-            
-            self.serial_conn.write(bytes(command))
             self.serial_conn.flush()
             return True
         except Exception as e:
-            print(f"發送命令失敗: {e}")
+            logger.error("清空輸出緩衝失敗: %s", e)
             return False
     
     # === 啟動命令 ===
     def start(self) -> bool:
         """啟動 OI (進入被動模式)"""
-        print("啟動機器人...")
+        logger.info("啟動機器人...")
         return self.send_command(128)
     
     def reset(self) -> bool:
         """重置機器人 (進入關閉模式)"""
-        print("重置機器人...")
+        logger.info("重置機器人...")
         return self.send_command(7)
     
     def stop(self) -> bool:
         """停止 OI (進入關閉模式)"""
-        print("停止機器人...")
+        logger.info("停止機器人...")
         return self.send_command(173)
     
     # === 模式命令 ===
     def safe_mode(self) -> bool:
         """進入安全模式"""
-        print("進入安全模式...")
+        logger.info("進入安全模式...")
         return self.send_command(131)
     
     def full_mode(self) -> bool:
         """進入完整模式"""
-        print("進入完整模式...")
+        logger.info("進入完整模式...")
         return self.send_command(132)
     
     # === 清掃命令 ===
     def clean(self) -> bool:
         """開始一般清掃 (隨機模式)"""
-        print("開始一般清掃...")
+        logger.info("開始一般清掃...")
         return self.send_command(135)
     
     def max_clean(self) -> bool:
         """開始最大清掃 (隨機+不回充)"""
-        print("開始最大清掃...")
+        logger.info("開始最大清掃...")
         return self.send_command(136)
     
     def seek_dock(self) -> bool:
         """尋找充電座並回充"""
-        print("尋找充電座...")
+        logger.info("尋找充電座...")
         return self.send_command(143)
     
     def power_off(self) -> bool:
         """關閉機器人電源"""
-        print("關閉電源...")
+        logger.info("關閉電源...")
         return self.send_command(133)
     
     # === 動作執行命令 ===
@@ -133,24 +377,14 @@ class iGlobaEdController:
                    特殊值: 32767/-1 = 直線, -1 = 順時針, 1 = 逆時針
         """
         # 限制範圍
-        velocity = max(-500, min(500, velocity))
-        radius = max(-2000, min(2000, radius))
-        
-        # 轉換為 2's complement 16-bit
-        if velocity < 0:
-            velocity = 65536 + velocity
-        if radius < 0:
-            radius = 65536 + radius
+        velocity = _clamp16(velocity, 500)
+        radius = _clamp16(radius, 2000)
         
-        vel_high = (velocity >> 8) & 0xFF
-        vel_low = velocity & 0xFF
-        rad_high = (radius >> 8) & 0xFF
-        rad_low = radius & 0xFF
+        logger.debug("行走: 速度=%dmm/s, 半徑=%dmm", velocity, radius)
         
-        print(f"行走: 速度={velocity-65536 if velocity > 32767 else velocity}mm/s, "
-              f"半徑={radius-65536 if radius > 32767 else radius}mm")
-        
-        return self.send_command(137, [vel_high, vel_low, rad_high, rad_low])
+        # signed 16-bit 由 struct 處理 2's complement
+        _DRIVE.pack_into(self._cmd_buf, 0, 137, velocity, radius)
+        return self._write_frame(self._drive_frame)
     
     def drive_direct(self, left_velocity: int, right_velocity: int) -> bool:
         """
@@ -161,24 +395,13 @@ class iGlobaEdController:
             right_velocity: 右輪速度 (-500 到 500 mm/s)
         """
         # 限制範圍
-        left_velocity = max(-500, min(500, left_velocity))
-        right_velocity = max(-500, min(500, right_velocity))
-        
-        # 轉換為 2's complement 16-bit
-        if left_velocity < 0:
-            left_velocity = 65536 + left_velocity
-        if right_velocity < 0:
-            right_velocity = 65536 + right_velocity
-        
-        left_high = (left_velocity >> 8) & 0xFF
-        left_low = left_velocity & 0xFF
-        right_high = (right_velocity >> 8) & 0xFF
-        right_low = right_velocity & 0xFF
+        left_velocity = _clamp16(left_velocity, 500)
+        right_velocity = _clamp16(right_velocity, 500)
         
-        print(f"直接驅動: 左輪={left_velocity-65536 if left_velocity > 32767 else left_velocity}mm/s, "
-              f"右輪={right_velocity-65536 if right_velocity > 32767 else right_velocity}mm/s")
+        logger.debug("直接驅動: 左輪=%dmm/s, 右輪=%dmm/s", left_velocity, right_velocity)
         
-        return self.send_command(145, [left_high, left_low, right_high, right_low])
+        _DRIVE.pack_into(self._cmd_buf, 0, 145, left_velocity, right_velocity)
+        return self._write_frame(self._drive_frame)
     
     def drive_pwm(self, left_pwm: int, right_pwm: int) -> bool:
         """
@@ -189,24 +412,13 @@ class iGlobaEdController:
             right_pwm: 右輪 PWM (-255 到 255)
         """
         # 限制範圍
-        left_pwm = max(-255, min(255, left_pwm))
-        right_pwm = max(-255, min(255, right_pwm))
-        
-        # 轉換為 2's complement 16-bit
-        if left_pwm < 0:
-            left_pwm = 65536 + left_pwm
-        if right_pwm < 0:
-            right_pwm = 65536 + right_pwm
-        
-        left_high = (left_pwm >> 8) & 0xFF
-        left_low = left_pwm & 0xFF
-        right_high = (right_pwm >> 8) & 0xFF
-        right_low = right_pwm & 0xFF
+        left_pwm = _clamp16(left_pwm, 255)
+        right_pwm = _clamp16(right_pwm, 255)
         
-        print(f"PWM 驅動: 左輪={left_pwm-65536 if left_pwm > 32767 else left_pwm}, "
-              f"右輪={right_pwm-65536 if right_pwm > 32767 else right_pwm}")
+        logger.debug("PWM 驅動: 左輪=%d, 右輪=%d", left_pwm, right_pwm)
         
-        return self.send_command(146, [left_high, left_low, right_high, right_low])
+        _DRIVE.pack_into(self._cmd_buf, 0, 146, left_pwm, right_pwm)
+        return self._write_frame(self._drive_frame)
     
     def motors(self, side_brush: bool = False, vacuum_fan: bool = False) -> bool:
         """
@@ -222,10 +434,10 @@ class iGlobaEdController:
         if vacuum_fan:
             motor_byte |= 0x04  # bit 2
         
-        print(f"馬達控制: 側刷={'開' if side_brush else '關'}, "
-              f"吸塵風扇={'開' if vacuum_fan else '關'}")
+        logger.info("馬達控制: 側刷=%s, 吸塵風扇=%s",
+                    '開' if side_brush else '關', '開' if vacuum_fan else '關')
         
-        return self.send_command(138, [motor_byte])
+        return self._write_frame(_MOTORS.pack(138, motor_byte))
     
     def leds(self, color: int = 0) -> bool:
         """
@@ -235,10 +447,9 @@ class iGlobaEdController:
             color: LED 顏色 (0=關閉, 1=藍燈, 2=紅燈, 3=藍燈+紅燈)
         """
         color = max(0, min(3, color))
-        color_names = ['關閉', '藍燈', '紅燈', '藍燈+紅燈']
-        print(f"LED 控制: {color_names[color]}")
+        logger.info("LED 控制: %s", _COLOR_NAMES[color])
         
-        return self.send_command(139, [color])
+        return self._write_frame(_LEDS.pack(139, color))
     
     # === 感測器命令 ===
     def read_sensor(self, packet_id: int) -> Optional[bytes]:
@@ -248,10 +459,8 @@ class iGlobaEdController:
         Args:
             packet_id: 資料包編號
         """
-        if self.send_command(142, [packet_id]):
-            time.sleep(0.1)  # 等待回應
-            if self.serial_conn.in_waiting > 0:
-                return self.serial_conn.read(self.serial_conn.in_waiting)
+        if self._write_frame(_SENSOR.pack(142, packet_id)):
+            return self._read_response(_PACKET_LENGTHS.get(packet_id))
         return None
     
     def query_sensors(self, packet_ids: List[int]) -> Optional[bytes]:
@@ -263,11 +472,26 @@ class iGlobaEdController:
         """
         command_data = [len(packet_ids)] + packet_ids
         if self.send_command(149, command_data):
-            time.sleep(0.1)  # 等待回應
-            if self.serial_conn.in_waiting > 0:
-                return self.serial_conn.read(self.serial_conn.in_waiting)
+            try:
+                length = sum(_PACKET_LENGTHS[packet_id] for packet_id in packet_ids)
+            except KeyError:
+                length = None
+            return self._read_response(length)
         return None
     
+    def _read_response(self, length: Optional[int]) -> Optional[bytes]:
+        """
+        讀取感測器回應
+        
+        Args:
+            length: 預期回應長度 (None=未知, 等待固定時間後讀取緩衝區內資料)
+        """
+        if length is None:
+            time.sleep(0.1)  # 等待回應
+            length = self.serial_conn.in_waiting
+        # 已知長度時資料一到齊即返回, 最多等待讀取逾時
+        return self.serial_conn.read(length) or None
+    
     def start_stream(self, packet_ids: List[int]):
         """
         開始資料流
@@ -277,11 +501,17 @@ class iGlobaEdController:
         """
         command_data = [len(packet_ids)] + packet_ids
         if self.send_command(148, command_data):
+            # 清除上一次資料流的快照與紀錄
+            self._stream_record[:] = [0] * len(STREAM_FIELDS)
+            self.stream_history.fill(0)
+            self.stream_frames = 0
+            self._stream_buf.clear()
+            
+            # 以 selector 監看串列埠, 由 poll_stream()/read_stream() 在呼叫端讀取
+            self._stream_selector = selectors.DefaultSelector()
+            self._stream_selector.register(self.serial_conn.fileno(), selectors.EVENT_READ)
             self.streaming = True
-            self.stream_thread = threading.Thread(target=self._stream_reader)
-            self.stream_thread.daemon = True
-            self.stream_thread.start()
-            print(f"開始資料流: {packet_ids}")
+            logger.info("開始資料流: %s", packet_ids)
     
     def pause_stream(self, pause: bool = True):
         """
@@ -292,227 +522,229 @@ class iGlobaEdController:
         """
         state = 0 if pause else 1
         self.send_command(150, [state])
-        print(f"資料流: {'暫停' if pause else '恢復'}")
+        logger.info("資料流: %s", '暫停' if pause else '恢復')
     
     def stop_stream(self):
         """停止資料流"""
         self.streaming = False
-        if self.stream_thread:
-            self.stream_thread.join(timeout=1)
-        print("停止資料流")
-    
-    def _stream_reader(self):
-        """資料流讀取執行緒"""
-        while self.streaming:
-            if self.serial_conn.in_waiting > 0:
-                data = self.serial_conn.read(self.serial_conn.in_waiting)
-                self._parse_stream_data(data)
-            time.sleep(0.015)  # 15ms 間隔
+        if self._stream_selector:
+            self._stream_selector.close()
+            self._stream_selector = None
+        if self._stream_event:
+            # 喚醒等待中的 read_stream()
+            self._stream_event.set()
+        logger.info("停止資料流")
+    
+    def poll_stream(self, timeout: Optional[float] = 0) -> bool:
+        """
+        處理已到達的資料流資料 (於主迴圈中呼叫)
+        
+        持續讀取直到至少組成一個完整框架或逾時, 不完整的框架保留至下次呼叫。
+        
+        Args:
+            timeout: 等待完整框架的最長秒數 (0=不等待, None=持續等待)
+            
+        Returns:
+            是否記錄到新的框架
+        """
+        if not self.streaming:
+            return False
+        frames = self.stream_frames
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.stream_frames == frames:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._stream_selector.select(remaining):
+                return False
+            self._read_stream_data()
+        return True
+    
+    async def read_stream(self):
+        """以 asyncio 持續處理資料流, 直到呼叫 stop_stream()"""
+        loop = asyncio.get_event_loop()
+        fd = self.serial_conn.fileno()
+        event = self._stream_event = asyncio.Event()
+        read_stream_data = self._read_stream_data
+        loop.add_reader(fd, event.set)
+        try:
+            # 每次迭代只直接讀取 self.streaming 以接收停止訊號
+            while self.streaming:
+                await event.wait()
+                event.clear()
+                if self.streaming:
+                    read_stream_data()
+        finally:
+            loop.remove_reader(fd)
+            self._stream_event = None
+    
+    def _read_stream_data(self):
+        """讀取串列埠緩衝區內的資料流資料 (可能只是部分框架)"""
+        data = self.serial_conn.read(self.serial_conn.in_waiting)
+        if data:
+            self._parse_stream_data(data)
     
     def _parse_stream_data(self, data: bytes):
-        """解析資料流資料"""
-        if len(data) >= 3 and data[0] == 19:  # 資料流標頭
-            print(f"接收資料流: {data.hex()}")
-            self.parse_sensor_data(data[2:])  # 跳過標頭解析資料
+        """解析資料流資料 (與上次剩餘的不完整框架合併)"""
+        if logger.isEnabledFor(logging.DEBUG):  # 避免每次讀取都產生 hex 字串
+            logger.debug("接收資料流: %s", data.hex())
+        buf = self._stream_buf
+        buf += data
+        self.stream_frames, consumed = _parse_stream_batch(
+            buf, self._stream_record, self.stream_history,
+            self.stream_frames, time.time())
+        del buf[:consumed]
+    
+    def get_stream_data(self) -> Optional[dict]:
+        """
+        取得最新的資料流紀錄
+        
+        Returns:
+            依 SENSOR_DTYPE 欄位命名的字典, 尚未收到資料流時為 None
+        """
+        if not self.stream_frames:
+            return None
+        row = self.stream_history[(self.stream_frames - 1) % STREAM_BUFFER_SIZE]
+        return dict(zip(SENSOR_DTYPE.names, row.item()))
+    
+    def get_stream_history(self) -> np.ndarray:
+        """
+        取得環形緩衝區內的資料流紀錄
+        
+        Returns:
+            依時間排序的 SENSOR_DTYPE 陣列 (最多 STREAM_BUFFER_SIZE 筆, 僅含本次資料流);
+            ts 為讀取時間, 同一次讀取解析出的多個框架共用同一個 ts
+        """
+        count = self.stream_frames
+        if count <= STREAM_BUFFER_SIZE:
+            return self.stream_history[:count].copy()
+        start = count % STREAM_BUFFER_SIZE
+        return np.concatenate((self.stream_history[start:], self.stream_history[:start]))
     
     # === 便利方法 ===
     def move_forward(self, speed: int = 200, duration: float = 1.0):
         """向前移動"""
-        print(f"向前移動 {duration} 秒, 速度 {speed}mm/s")
+        logger.info("向前移動 %s 秒, 速度 %dmm/s", duration, speed)
         self.drive(speed, 32767)  # 直線移動
         time.sleep(duration)
         self.drive(0, 0)  # 停止
-        print(f"已經停止")
+        self.flush()
+        logger.info("已經停止")
 
     
     def move_backward(self, speed: int = 200, duration: float = 1.0):
         """向後移動"""
-        print(f"向後移動 {duration} 秒, 速度 {speed}mm/s")
+        logger.info("向後移動 %s 秒, 速度 %dmm/s", duration, speed)
         self.drive(-speed, 32767)  # 直線移動
         time.sleep(duration)
         self.drive(0, 0)  # 停止
-        print(f"已經停止")
+        self.flush()
+        logger.info("已經停止")
     
     def turn_left(self, duration: float = 1.0):
         """左轉"""
-        print(f"左轉 {duration} 秒")
+        logger.info("左轉 %s 秒", duration)
         self.drive(200, 1)  # 逆時針旋轉
         time.sleep(duration)
         self.drive(0, 0)  # 停止
+        self.flush()
     
     def turn_right(self, duration: float = 1.0):
         """右轉"""
-        print(f"右轉 {duration} 秒")
+        logger.info("右轉 %s 秒", duration)
         self.drive(200, -1)  # 順時針旋轉
         time.sleep(duration)
         self.drive(0, 0)  # 停止
+        self.flush()
     
     def stop_movement(self):
         """停止移動"""
-        print("停止移動")
+        logger.info("停止移動")
         self.drive(0, 0)
+        self.flush()
     
     # === 感測器資料解析方法 ===
-    def parse_sensor_data(self, data: bytes, packet_id: int = None):
+    def parse_sensor_data(self, data: bytes, packet_id: int = None, offset: int = 0):
         """
         解析感測器資料
         
         Args:
             data: 原始感測器資料
             packet_id: 指定的封包ID (如果已知)
+            offset: 封包資料在 data 中的起點 (直接讀取, 不複製)
         """
         if not data:
             return None
         
         # 如果沒有指定封包ID，嘗試從資料中識別
         if packet_id is None:
-            if len(data) >= 1:
-                packet_id = data[0]
-                data = data[1:]  # 跳過封包ID
+            if len(data) > offset:
+                packet_id = data[offset]
+                offset += 1  # 跳過封包ID
         
-        result = {}
+        handler = self._parsers.get(packet_id)
+        if handler is None:
+            return {"packet_id": packet_id, "raw_data": data[offset:].hex()}
+        
+        # 統一檢查長度, 各 _parse_* 方法不再個別檢查
+        if len(data) < offset + _PACKET_LENGTHS[packet_id]:
+            return {"error": "資料長度不足"}
         
         try:
-            if packet_id == 7:  # IR Bumps and Drops
-                result = self._parse_ir_bumps_drops(data)
-            elif packet_id == 8:  # Guide Sensors Signal Detect
-                result = self._parse_guide_sensors_flag(data)
-            elif packet_id == 9:  # IR Bumps Signal Level
-                result = self._parse_ir_signal_level(data)
-            elif packet_id == 10:  # Guide Sensors Signal Level
-                result = self._parse_guide_signal_level(data)
-            elif packet_id == 11:  # Motors Overcurrents
-                result = self._parse_motor_overcurrents(data)
-            elif packet_id == 12:  # Charging Source and State
-                result = self._parse_charging_state(data)
-            elif packet_id == 13:  # Battery Voltage
-                result = self._parse_battery_voltage(data)
-            elif packet_id == 15:  # Requested Velocity
-                result = self._parse_requested_velocity(data)
-            elif packet_id == 16:  # Requested Radius
-                result = self._parse_requested_radius(data)
-            elif packet_id == 17:  # Requested Left/Right Velocity
-                result = self._parse_requested_lr_velocity(data)
-            elif packet_id == 18:  # Left/Right Encoder Counts
-                result = self._parse_encoder_counts(data)
-            elif packet_id == 19:  # Operate Mode
-                result = self._parse_operate_mode(data)
-            elif packet_id == 20:  # Motors Current
-                result = self._parse_motors_current(data)
-            else:
-                result = {"packet_id": packet_id, "raw_data": data.hex()}
-                
+            result = handler(data, offset)
         except Exception as e:
-            result = {"error": f"解析錯誤: {e}", "packet_id": packet_id, "raw_data": data.hex()}
+            result = {"error": f"解析錯誤: {e}", "packet_id": packet_id, "raw_data": data[offset:].hex()}
         
         return result
     
-    def _parse_ir_bumps_drops(self, data: bytes) -> dict:
+    # 以下 _parse_* 為內部快速路徑: 呼叫端須確保 data 在 offset 之後
+    # 至少有 _PACKET_LENGTHS[封包ID] 個位元組
+    def _parse_ir_bumps_drops(self, data: bytes, offset: int) -> dict:
         """解析 IR 防碰撞和落下感測器 (封包 7)"""
-        if len(data) < 2:
-            return {"error": "資料長度不足"}
-        
         # 16-bit 資料
-        value = (data[0] << 8) | data[1]
-        
-        # IR 防碰撞感測器 (bit 0-6)
-        ir_bumps = []
-        for i in range(7):
-            ir_bumps.append(bool(value & (1 << i)))
-        
-        # 落下感測器 (bit 9-11)
-        drop_sensors = []
-        for i in range(3):
-            drop_sensors.append(bool(value & (1 << (9 + i))))
+        value, = _U16.unpack_from(data, offset)
         
         return {
             "packet_id": 7,
-            "ir_bumps": {
-                "sensor_1": ir_bumps[0],
-                "sensor_2": ir_bumps[1],
-                "sensor_3": ir_bumps[2],
-                "sensor_4": ir_bumps[3],
-                "sensor_5": ir_bumps[4],
-                "sensor_6": ir_bumps[5],
-                "sensor_7": ir_bumps[6]
-            },
-            "drop_sensors": {
-                "sensor_1": drop_sensors[0],
-                "sensor_2": drop_sensors[1],
-                "sensor_3": drop_sensors[2]
-            },
+            "ir_mask": IrBumps(value & 0x7F),                # bit 0-6
+            "drop_mask": DropSensors((value >> 9) & 0x07),   # bit 9-11
             "raw_value": value
         }
     
-    def _parse_guide_sensors_flag(self, data: bytes) -> dict:
+    def _parse_guide_sensors_flag(self, data: bytes, offset: int) -> dict:
         """解析 Guide 感測器旗標和類型 (封包 8)"""
-        if len(data) < 2:
-            return {"error": "資料長度不足"}
-        
-        value = (data[0] << 8) | data[1]
-        
-        # 解析各個 Guide 感測器
-        sensors = {}
-        for i in range(4):
-            sensor_num = i + 1
-            # 訊號類型 (每個感測器 2 bits)
-            signal_type = (value >> (i * 2)) & 0x03
-            signal_types = ["無訊號", "充電座中央訊號(2K)", "充電座右側訊號(10K)", "充電座左側訊號(5K)"]
-            
-            # 檢測旗標
-            flag_detected = bool(value & (1 << (12 + i)))
-            
-            sensors[f"guide_sensor_{sensor_num}"] = {
-                "signal_type": signal_types[signal_type],
-                "signal_detected": flag_detected
-            }
+        value, = _U16.unpack_from(data, offset)
         
+        # 訊號類型 (每個感測器 2 bits) 與檢測旗標 (bit 12-15)
         return {
             "packet_id": 8,
-            "guide_sensors": sensors,
+            "guide_sensors": {
+                name: {
+                    "signal_type": _SIGNAL_TYPES[(value & type_mask) >> shift],
+                    "signal_detected": bool(value & flag_mask)
+                }
+                for name, type_mask, shift, flag_mask in _GUIDE_TYPE_MASKS
+            },
             "raw_value": value
         }
     
-    def _parse_ir_signal_level(self, data: bytes) -> dict:
+    def _parse_ir_signal_level(self, data: bytes, offset: int) -> dict:
         """解析 IR 防碰撞感測器訊號值 (封包 9)"""
-        if len(data) < 14:
-            return {"error": "資料長度不足"}
-        
-        sensors = {}
-        for i in range(7):
-            offset = i * 2
-            value = (data[offset] << 8) | data[offset + 1]
-            sensors[f"ir_sensor_{i+1}"] = value
-        
         return {
             "packet_id": 9,
-            "ir_signal_levels": sensors,
+            "ir_signal_levels": dict(zip(_IR_SENSOR_KEYS, _U16X7.unpack_from(data, offset))),
             "max_value": 4095
         }
     
-    def _parse_guide_signal_level(self, data: bytes) -> dict:
+    def _parse_guide_signal_level(self, data: bytes, offset: int) -> dict:
         """解析 Guide 感測器訊號值 (封包 10)"""
-        if len(data) < 8:
-            return {"error": "資料長度不足"}
-        
-        sensors = {}
-        for i in range(4):
-            offset = i * 2
-            value = (data[offset] << 8) | data[offset + 1]
-            sensors[f"guide_sensor_{i+1}"] = value
-        
         return {
             "packet_id": 10,
-            "guide_signal_levels": sensors,
+            "guide_signal_levels": dict(zip(_GUIDE_SENSOR_KEYS, _U16X4.unpack_from(data, offset))),
             "max_value": 4095
         }
     
-    def _parse_motor_overcurrents(self, data: bytes) -> dict:
+    def _parse_motor_overcurrents(self, data: bytes, offset: int) -> dict:
         """解析馬達過電流狀態 (封包 11)"""
-        if len(data) < 1:
-            return {"error": "資料長度不足"}
-        
-        value = data[0]
+        value = data[offset]
         
         return {
             "packet_id": 11,
@@ -525,21 +757,16 @@ class iGlobaEdController:
             "raw_value": value
         }
     
-    def _parse_charging_state(self, data: bytes) -> dict:
+    def _parse_charging_state(self, data: bytes, offset: int) -> dict:
         """解析充電來源和狀態 (封包 12)"""
-        if len(data) < 1:
-            return {"error": "資料長度不足"}
-        
-        value = data[0]
+        value = data[offset]
         state = value & 0x03
         source_dc = bool(value & 0x04)
         source_dock = bool(value & 0x08)
         
-        states = ["未充電", "已充飽", "充電中", "充電錯誤"]
-        
         return {
             "packet_id": 12,
-            "charging_state": states[state],
+            "charging_state": _CHARGING_STATES[state],
             "charging_sources": {
                 "dc_adapter": source_dc,
                 "charging_dock": source_dock
@@ -547,12 +774,9 @@ class iGlobaEdController:
             "raw_value": value
         }
     
-    def _parse_battery_voltage(self, data: bytes) -> dict:
+    def _parse_battery_voltage(self, data: bytes, offset: int) -> dict:
         """解析電池電壓 (封包 13)"""
-        if len(data) < 2:
-            return {"error": "資料長度不足"}
-        
-        voltage = (data[0] << 8) | data[1]
+        voltage, = _U16.unpack_from(data, offset)
         
         return {
             "packet_id": 13,
@@ -560,30 +784,18 @@ class iGlobaEdController:
             "battery_voltage_v": voltage / 1000.0
         }
     
-    def _parse_requested_velocity(self, data: bytes) -> dict:
+    def _parse_requested_velocity(self, data: bytes, offset: int) -> dict:
         """解析請求速度 (封包 15)"""
-        if len(data) < 2:
-            return {"error": "資料長度不足"}
-        
-        velocity = (data[0] << 8) | data[1]
-        # 轉換 2's complement
-        if velocity > 32767:
-            velocity = velocity - 65536
+        velocity, = _I16.unpack_from(data, offset)
         
         return {
             "packet_id": 15,
             "requested_velocity_mms": velocity
         }
     
-    def _parse_requested_radius(self, data: bytes) -> dict:
+    def _parse_requested_radius(self, data: bytes, offset: int) -> dict:
         """解析請求半徑 (封包 16)"""
-        if len(data) < 2:
-            return {"error": "資料長度不足"}
-        
-        radius = (data[0] << 8) | data[1]
-        # 轉換 2's complement
-        if radius > 32767:
-            radius = radius - 65536
+        radius, = _I16.unpack_from(data, offset)
         
         # 特殊值處理
         if radius == 32767 or radius == -32768:
@@ -601,19 +813,9 @@ class iGlobaEdController:
             "radius_description": radius_desc
         }
     
-    def _parse_requested_lr_velocity(self, data: bytes) -> dict:
+    def _parse_requested_lr_velocity(self, data: bytes, offset: int) -> dict:
         """解析左右輪請求速度 (封包 17)"""
-        if len(data) < 4:
-            return {"error": "資料長度不足"}
-        
-        left_vel = (data[0] << 8) | data[1]
-        right_vel = (data[2] << 8) | data[3]
-        
-        # 轉換 2's complement
-        if left_vel > 32767:
-            left_vel = left_vel - 65536
-        if right_vel > 32767:
-            right_vel = right_vel - 65536
+        left_vel, right_vel = _I16X2.unpack_from(data, offset)
         
         return {
             "packet_id": 17,
@@ -621,13 +823,9 @@ class iGlobaEdController:
             "right_wheel_velocity_mms": right_vel
         }
     
-    def _parse_encoder_counts(self, data: bytes) -> dict:
+    def _parse_encoder_counts(self, data: bytes, offset: int) -> dict:
         """解析編碼器計數 (封包 18)"""
-        if len(data) < 4:
-            return {"error": "資料長度不足"}
-        
-        left_count = (data[0] << 8) | data[1]
-        right_count = (data[2] << 8) | data[3]
+        left_count, right_count = _U16X2.unpack_from(data, offset)
         
         return {
             "packet_id": 18,
@@ -635,29 +833,20 @@ class iGlobaEdController:
             "right_encoder_count": right_count
         }
     
-    def _parse_operate_mode(self, data: bytes) -> dict:
+    def _parse_operate_mode(self, data: bytes, offset: int) -> dict:
         """解析操作模式 (封包 19)"""
-        if len(data) < 1:
-            return {"error": "資料長度不足"}
-        
-        mode = data[0] & 0x03
-        modes = ["關閉(Off)", "被動(Passive)", "安全(Safe)", "完整(Full)"]
+        mode = data[offset] & 0x03
         
         return {
             "packet_id": 19,
-            "operate_mode": modes[mode],
+            "operate_mode": _OPERATE_MODES[mode],
             "mode_value": mode
         }
     
-    def _parse_motors_current(self, data: bytes) -> dict:
+    def _parse_motors_current(self, data: bytes, offset: int) -> dict:
         """解析馬達電流 (封包 20)"""
-        if len(data) < 8:
-            return {"error": "資料長度不足"}
-        
-        left_current = (data[0] << 8) | data[1]
-        right_current = (data[2] << 8) | data[3]
-        side_brush_current = (data[4] << 8) | data[5]
-        main_brush_current = (data[6] << 8) | data[7]
+        left_current, right_current, side_brush_current, main_brush_current = \
+            _U16X4.unpack_from(data, offset)
         
         return {
             "packet_id": 20,
@@ -688,17 +877,73 @@ class iGlobaEdController:
         """讀取所有主要感測器資料"""
         sensors = {}
         
-        # 主要感測器封包
-        important_packets = [7, 11, 12, 13, 19]
+        # 以單次查詢 (149) 取得所有主要感測器封包
+        try:
+            data = self.query_sensors(list(_MAIN_PACKETS))
+        except Exception as e:
+            return {f"packet_{packet_id}": {"error": str(e)} for packet_id in _MAIN_PACKETS}
+        
+        if not data:
+            return sensors
+        
+        parse = self.parse_sensor_data
+        size = len(data)
+        for packet_id, start, end in _MAIN_PACKET_OFFSETS:
+            if size < end:
+                break
+            sensors[f"packet_{packet_id}"] = parse(data, packet_id, start)
+        
+        return sensors
+    
+    def snapshot_sensors(self, packet_ids: Tuple[int, ...] = _MAIN_PACKETS) -> dict:
+        """
+        以單一資料流框架 (148) 讀取感測器快照
+        
+        Args:
+            packet_ids: 感測器封包ID
+            
+        Returns:
+            與 get_all_sensors() 相同格式的感測器資料字典
+        """
+        sensors = {}
+        if self.streaming:
+            logger.error("錯誤: 資料流進行中, 無法讀取快照")
+            return sensors
+        
+        unknown = [packet_id for packet_id in packet_ids if packet_id not in _PACKET_LENGTHS]
+        if unknown:
+            logger.error("錯誤: 不支援的封包ID %s", unknown)
+            return sensors
         
-        for packet_id in important_packets:
-            try:
-                data = self.read_and_parse_sensor(packet_id)
-                if data:
-                    sensors[f"packet_{packet_id}"] = data
-                time.sleep(0.05)  # 避免過快請求
-            except Exception as e:
-                sensors[f"packet_{packet_id}"] = {"error": str(e)}
+        # 框架: [19][n] + 每個封包 [封包ID][資料] + [校驗和]
+        frame_length = 3 + sum(_PACKET_LENGTHS[packet_id] + 1 for packet_id in packet_ids)
+        
+        if not self.serial_conn or not self.serial_conn.is_open:
+            logger.error("錯誤: 未連接到機器人")
+            return sensors
+        self.serial_conn.reset_input_buffer()
+        if not self.send_command(148, [len(packet_ids), *packet_ids]):
+            return sensors
+        try:
+            frame = self.serial_conn.read(frame_length)
+        finally:
+            # 暫停資料流並丟棄其後送出的框架
+            self.send_command(150, [0])
+            self.serial_conn.reset_input_buffer()
+        
+        # 檢查標頭、長度與校驗和, 拒絕未對齊的框架
+        if (len(frame) < frame_length or frame[0] != 19
+                or frame[1] != frame_length - 3 or sum(frame) & 0xFF):
+            logger.error("錯誤: 資料流框架無效")
+            return sensors
+        
+        parse = self.parse_sensor_data
+        offset = 2
+        for packet_id in packet_ids:
+            if frame[offset] != packet_id:
+                break
+            sensors[f"packet_{packet_id}"] = parse(frame, packet_id, offset + 1)
+            offset += 1 + _PACKET_LENGTHS[packet_id]
         
         return sensors
     
@@ -730,18 +975,18 @@ class iGlobaEdController:
         
         # IR 防碰撞感測器
         ir_data = self.read_and_parse_sensor(7)
-        if ir_data and 'ir_bumps' in ir_data:
-            bumps = ir_data['ir_bumps']
-            active_bumps = [k for k, v in bumps.items() if v]
+        if ir_data and 'ir_mask' in ir_data:
+            ir_mask = ir_data['ir_mask']
+            active_bumps = [flag.name for flag in IrBumps if flag in ir_mask]
             if active_bumps:
                 print(f"IR 防碰撞觸發: {', '.join(active_bumps)}")
             else:
                 print("IR 防碰撞: 正常")
         
         # 落下感測器
-        if ir_data and 'drop_sensors' in ir_data:
-            drops = ir_data['drop_sensors']
-            active_drops = [k for k, v in drops.items() if v]
+        if ir_data and 'drop_mask' in ir_data:
+            drop_mask = ir_data['drop_mask']
+            active_drops = [flag.name for flag in DropSensors if flag in drop_mask]
             if active_drops:
                 print(f"落下感測器觸發: {', '.join(active_drops)}")
             else:
@@ -761,6 +1006,7 @@ class iGlobaEdController:
 
 def main():
     """主程式 - 示範用法"""
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("iGloba Ed 機器人控制器")
     print("=" * 30)
     